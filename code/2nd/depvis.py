@@ -1,5 +1,6 @@
 import configparser
 import argparse
+import re
 from graph_viz import (
     visualize_dependencies,
     fetch_and_parse_package_json,
@@ -8,20 +9,88 @@ from graph_viz import (
     get_direct_deps_from_dict
 )
 
+_SECTION_RE = re.compile(r'\[([^\]]+)\]\s*$')
+_OPTION_RE = re.compile(r'([A-Za-z_]\w*)\s*=\s*(.*?)\s*$')
+
+def _fast_parse_default(text):
+    """
+    Построчно разбирает файл из плоских строк key = value и возвращает секцию [DEFAULT].
+    Возвращает None, если в файле встречается то, что нужно отдать configparser: продолжения
+    строк, разделитель ':', строки вне секций, повторы секций и ключей, интерполяция в [DEFAULT].
+    """
+    sections = {}
+    current = None
+    # configparser делит текст только по '\n', splitlines разбил бы строку и по '\f', '\x85' и т.п.
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+        # Строка с отступом может быть продолжением значения
+        if line[0].isspace():
+            return None
+        match = _SECTION_RE.match(line)
+        if match:
+            name = match.group(1)
+            if name in sections:
+                return None
+            current = sections[name] = {}
+            continue
+        match = _OPTION_RE.match(line)
+        if match is None or current is None:
+            return None
+        # configparser приводит ключи к нижнему регистру
+        key = match.group(1).lower()
+        if key in current:
+            return None
+        current[key] = match.group(2)
+
+    default = sections.get('DEFAULT', {})
+    if any('%' in value for value in default.values()):
+        return None
+    return default
+
+def load_settings(path):
+    """
+    Читает секцию [DEFAULT] конфигурации как {ключ: значение} без создания ConfigParser.
+    Файлы с синтаксисом сложнее плоских строк key = value разбираются configparser как раньше.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        # Как и ConfigParser.read: отсутствующий файл просто не дает настроек
+        text = ''
+
+    settings = _fast_parse_default(text)
+    if settings is not None:
+        return settings
+
+    config = configparser.ConfigParser()
+    config.read_string(text, source=path)
+    return dict(config['DEFAULT'])
+
+def _getboolean(value):
+    """Преобразует значение в bool по тем же правилам, что и ConfigParser.getboolean."""
+    if value is None:
+        return None
+    try:
+        return configparser.ConfigParser.BOOLEAN_STATES[value.lower()]
+    except KeyError:
+        raise ValueError(f'Not a boolean: {value}')
+
 def main():
     parser = argparse.ArgumentParser(description='Tool for visualizing package dependencies.')
     parser.add_argument('--config', type=str, default='config.ini', help='Path to the INI config file')
     args = parser.parse_args()
 
-    config = configparser.ConfigParser()
-    config.read(args.config)
+    settings = load_settings(args.config)
 
-    package_name = config['DEFAULT']['package_name']
-    repo_url = config['DEFAULT']['repo_url']
-    repo_mode = config['DEFAULT']['repo_mode']
-    output_image = config['DEFAULT']['output_image']
-    output_ascii = config['DEFAULT'].getboolean('output_ascii')
-    output_dot_file = config['DEFAULT'].get('output_dot_file', None) # Новый параметр
+    package_name = settings['package_name']
+    repo_url = settings['repo_url']
+    repo_mode = settings['repo_mode']
+    output_image = settings['output_image']
+    output_ascii = _getboolean(settings.get('output_ascii'))
+    output_dot_file = settings.get('output_dot_file', None) # Новый параметр
 
     print(f"Config loaded:")
     print(f" - Package: {package_name}")
@@ -39,7 +108,8 @@ def main():
     elif repo_mode == 'git':
         print("Running in git mode...")
         initial_deps = fetch_and_parse_package_json(repo_url)
-        get_deps_func = lambda pkg: initial_deps if pkg == package_name else {}
+        root_deps = next(iter(initial_deps.values()))
+        get_deps_func = lambda pkg: root_deps if pkg == package_name else []
         full_graph = build_full_dependency_graph(package_name, get_deps_func)
     else:
         print(f"Unknown repo_mode: {repo_mode}")
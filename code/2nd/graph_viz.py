@@ -1,88 +1,241 @@
 import os
-import tempfile
+import sys
+import shutil
+import hashlib
 import subprocess
 import json
-from graphviz import Digraph
+import re
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import urllib.request
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него используется стандартный json
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка кэша недоступна
+    fcntl = None
+
+# orjson разбирает байты напрямую, без промежуточного decode('utf-8')
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+REPO_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'depvis', 'repos')
+# Только HTTP(S)-адреса: SSH-адреса (git@github.com:...) обычно ведут в приватные репозитории,
+# которые анонимный raw.githubusercontent.com не отдает, поэтому они сразу идут через git
+GITHUB_URL_RE = re.compile(r'^https?://github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$')
+
+# Пороговые размеры графа, после которых раскладка упрощается ради скорости
+ORTHO_SPLINES_THRESHOLD = 500
+SFDP_ENGINE_THRESHOLD = 1000
+# Больше этого числа узлов монолитный PNG становится непригодным: рисуем SVG с HTML-просмотрщиком
+SVG_VIEWER_THRESHOLD = 2000
+SVG_VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Dependency Graph</title>
+<style>
+  body {{ margin: 0; overflow: hidden; }}
+  #view {{ width: 100vw; height: 100vh; overflow: auto; }}
+  #graph {{ transform-origin: 0 0; }}
+</style>
+</head>
+<body>
+<div id="view"><img id="graph" src="{svg_name}" alt="Dependency Graph"></div>
+<script>
+  // Браузер растеризует только видимую область SVG, поэтому масштабирование дешевое.
+  var scale = 1, graph = document.getElementById('graph');
+  document.getElementById('view').addEventListener('wheel', function (e) {{
+    if (!e.ctrlKey) return;
+    e.preventDefault();
+    scale = Math.min(8, Math.max(0.05, scale * (e.deltaY < 0 ? 1.2 : 1 / 1.2)));
+    graph.style.transform = 'scale(' + scale + ')';
+  }}, {{ passive: false }});
+</script>
+</body>
+</html>
+"""
+
+# Число потоков для build_full_dependency_graph(parallel=True)
+FETCH_WORKERS = 16
 
 def load_test_repo(file_path):
     """Загружает зависимости из локального JSON-файла."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(file_path, 'rb') as f:
+        return _json_loads(f.read())
 
-def fetch_and_parse_package_json(repo_url):
-    """Клонирует репозиторий и извлекает прямые зависимости из package.json."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        try:
-            subprocess.run(['git', 'clone', repo_url, tmpdir], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except subprocess.CalledProcessError:
-            raise Exception("Failed to clone repository.")
-        
-        package_json_path = os.path.join(tmpdir, 'package.json')
-        if not os.path.exists(package_json_path):
-            raise Exception("package.json not found in repository.")
-
-        with open(package_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        dependencies = data.get('dependencies', {})
-        package_name = data.get('name', 'unknown-package')
-        return {package_name: list(dependencies.keys())}
-
-def build_full_dependency_graph(initial_package, get_direct_deps_func):
+def _fetch_github_package_json(repo_url):
     """
-    Рекурсивный BFS для построения полного графа зависимостей.
-    get_direct_deps_func: функция, возвращающая словарь {pkg: [deps]}
+    Скачивает package.json из GitHub напрямую, без git.
+    Возвращает None, если URL не из GitHub или файл не удалось получить и разобрать:
+    приватные репозитории тоже отвечают 404, поэтому решение об отсутствии package.json принимает git.
     """
-    visited = set()
-    graph = {}
-    recursion_stack = set()
+    match = GITHUB_URL_RE.match(repo_url)
+    if not match:
+        return None
+    owner, repo = match.groups()
+    raw_url = f'https://raw.githubusercontent.com/{owner}/{repo}/HEAD/package.json'
+    try:
+        with urllib.request.urlopen(raw_url, timeout=10) as response:
+            return _json_loads(response.read())
+    except (OSError, http.client.HTTPException, ValueError):
+        # OSError включает URLError/HTTPError и обрывы при чтении, HTTPException - IncompleteRead,
+        # ValueError - тело не JSON (например, страница прокси)
+        return None
 
-    def dfs_recursive(pkg):
-        if pkg in recursion_stack:
-            print(f"Warning: Cycle detected involving {pkg}")
-            return
-        if pkg in visited:
-            return
+def _clone_package_json(repo_url):
+    """
+    Читает package.json из кэшированного bare-зеркала репозитория.
+    Зеркало создается один раз, при повторных запусках выполняется только git fetch.
+    """
+    os.makedirs(REPO_CACHE_DIR, exist_ok=True)
+    mirror_dir = os.path.join(REPO_CACHE_DIR, hashlib.sha256(repo_url.encode('utf-8')).hexdigest() + '.git')
 
-        recursion_stack.add(pkg)
-        direct_deps = get_direct_deps_func(pkg)
-        graph.update(direct_deps)
+    # Блокировка защищает зеркало от одновременного обновления несколькими процессами
+    with open(mirror_dir + '.lock', 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
 
-        for dep in direct_deps.get(pkg, []):
-            dfs_recursive(dep)
+        if os.path.isdir(mirror_dir):
+            try:
+                subprocess.run(['git', '-C', mirror_dir, 'fetch', '--depth=1', '--prune', 'origin'],
+                               check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except subprocess.CalledProcessError:
+                print(f"Warning: failed to update cached repository, using cached copy of {repo_url}")
+        else:
+            try:
+                subprocess.run(['git', 'clone', '--mirror', '--depth=1', '--filter=blob:none', repo_url, mirror_dir],
+                               check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except subprocess.CalledProcessError:
+                shutil.rmtree(mirror_dir, ignore_errors=True)
+                raise Exception("Failed to clone repository.")
 
-        recursion_stack.remove(pkg)
-        visited.add(pkg)
+        # Рабочая копия не нужна: файл читается прямо из объекта HEAD
+        result = subprocess.run(['git', '-C', mirror_dir, 'show', 'HEAD:package.json'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        raise Exception("package.json not found in repository.")
+    return _json_loads(result.stdout)
 
-    dfs_recursive(initial_package)
+def fetch_and_parse_package_json(repo_url):
+    """Извлекает прямые зависимости из package.json репозитория."""
+    data = _fetch_github_package_json(repo_url)
+    if data is None:
+        data = _clone_package_json(repo_url)
+
+    dependencies = data.get('dependencies', {})
+    package_name = data.get('name', 'unknown-package')
+    return {package_name: list(dependencies.keys())}
+
+def build_full_dependency_graph(initial_package, get_direct_deps_func, parallel=False):
+    """
+    BFS по уровням для построения полного графа зависимостей.
+    get_direct_deps_func: функция, возвращающая список прямых зависимостей пакета
+    parallel: запрашивать зависимости пакетов одного уровня в FETCH_WORKERS потоках.
+    Имеет смысл только для сетевых функций; для словаря в памяти потоки лишь добавляют накладные расходы.
+    """
+    graph = {}
+    seen = {initial_package}
+    frontier = [initial_package]
+
+    executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS) if parallel else None
+    fetch_level = executor.map if executor is not None else map
+    try:
+        while frontier:
+            next_frontier = []
+            for pkg, deps in zip(frontier, fetch_level(get_direct_deps_func, frontier)):
+                graph[pkg] = deps
+                for dep in deps:
+                    if dep not in seen:
+                        seen.add(dep)
+                        next_frontier.append(dep)
+            frontier = next_frontier
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    _warn_cycles(initial_package, graph)
     return graph
 
+def _warn_cycles(initial_package, graph):
+    """
+    Итеративный DFS с раскраской вершин по уже построенному графу: сообщает об обратных ребрах.
+    Цвета: 0 - не посещена, 1 - в стеке обхода, 2 - обработана.
+    """
+    color = {initial_package: 1}
+    stack = [(initial_package, iter(graph[initial_package]))]
+
+    while stack:
+        pkg, deps = stack[-1]
+        dep = next(deps, None)
+        if dep is None:
+            color[pkg] = 2
+            stack.pop()
+            continue
+        # Обработанная (черная) вершина не может достичь вершин в стеке,
+        # поэтому общие поддеревья повторно не обходятся.
+        state = color.get(dep, 0)
+        if state == 1:
+            print(f"Warning: Cycle detected involving {dep}")
+        elif state == 0:
+            color[dep] = 1
+            stack.append((dep, iter(graph[dep])))
+
 def get_direct_deps_from_dict(deps_dict):
-    """Возвращает функцию, которая возвращает зависимости из словаря."""
+    """Возвращает функцию, которая возвращает список зависимостей пакета из словаря."""
     def get_deps(pkg):
-        return {pkg: deps_dict.get(pkg, [])}
+        return deps_dict.get(pkg, [])
     return get_deps
 
 def visualize_dependencies(deps_dict, output_file, output_ascii, root_package, output_dot_file=None):
     """
     Визуализирует граф зависимостей в PNG и, при необходимости, выводит ASCII-дерево и DOT-код.
+    Циклические зависимости в ASCII-дереве помечаются как [cycle].
     """
-    dot = Digraph(comment='Dependency Graph')
+    node_count = len(deps_dict)
+    engine = 'sfdp' if node_count > SFDP_ENGINE_THRESHOLD else 'dot'
+
+    # 1. Сформировать текстовое представление графа (в формате DOT, используемого graphviz).
+    # Собираем DOT-код напрямую: обертка graphviz форматирует и экранирует каждую строку отдельно.
+    parts = ['// Dependency Graph\n', 'digraph {\n']
+    if node_count > ORTHO_SPLINES_THRESHOLD:
+        # Ограничиваем итерации network simplex и отказываемся от сглаженных кривых,
+        # которые доминируют во времени раскладки больших графов.
+        parts.append('\tgraph [nslimit=5 nslimit1=5 outputorder=edgesfirst ranksep=2 splines=ortho]\n')
 
-    def add_nodes_edges(pkg):
-        dot.node(pkg, pkg)
-        for dep in deps_dict.get(pkg, []):
-            dot.edge(pkg, dep)
+    quoted = {}
+    def quote(name):
+        q = quoted.get(name)
+        if q is None:
+            q = quoted[name] = '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        return q
 
-    for pkg in deps_dict:
-        add_nodes_edges(pkg)
+    for pkg, deps in deps_dict.items():
+        q = quote(pkg)
+        parts.append(f'\t{q}\n')
+        parts.extend(f'\t{q} -> {quote(dep)}\n' for dep in deps)
+    parts.append('}\n')
+    dot_code = ''.join(parts)
 
     # 2. Сохранить изображение графа в файле формата PNG.
-    dot.render(output_file.replace('.png', ''), format='png', cleanup=True)
-    print(f"Graph image saved to {output_file}")
+    base_path = output_file.replace('.png', '')
+    if node_count > SVG_VIEWER_THRESHOLD:
+        # Большой граф рендерим один раз в SVG; просмотр и масштабирование - на стороне браузера
+        svg_path = base_path + '.svg'
+        subprocess.run(['dot', f'-K{engine}', '-Tsvg', '-o', svg_path],
+                       input=dot_code.encode('utf-8'), check=True)
+        viewer_path = base_path + '.html'
+        with open(viewer_path, 'w', encoding='utf-8') as f:
+            f.write(SVG_VIEWER_TEMPLATE.format(svg_name=os.path.basename(svg_path)))
+        print(f"Graph has {node_count} nodes, PNG skipped. SVG saved to {svg_path}, viewer: {viewer_path}")
+    else:
+        subprocess.run(['dot', f'-K{engine}', '-Tpng', '-o', base_path + '.png'],
+                       input=dot_code.encode('utf-8'), check=True)
+        print(f"Graph image saved to {output_file}")
 
-    # 1. Сформировать текстовое представление графа (в формате DOT, используемого graphviz).
-    dot_code = dot.source
     if output_dot_file:
         with open(output_dot_file, 'w', encoding='utf-8') as f:
             f.write(dot_code)
@@ -94,11 +247,26 @@ def visualize_dependencies(deps_dict, output_file, output_ascii, root_package, o
     # 3. Если задан соответствующий параметр, вывести на экран зависимости в виде ASCII-дерева.
     if output_ascii:
         print("\n--- ASCII Dependency Tree ---")
-        def print_tree(pkg, prefix=""):
-            print(prefix + pkg)
+        # Явный стек вместо рекурсии: глубокие деревья не упираются в лимит рекурсии,
+        # а весь вывод уходит одним вызовом write.
+        lines = []
+        path = []
+        on_path = set()
+        stack = [(root_package, "", 0)]
+        while stack:
+            pkg, prefix, depth = stack.pop()
+            for ancestor in path[depth:]:
+                on_path.discard(ancestor)
+            del path[depth:]
+            if pkg in on_path:
+                lines.append(prefix + pkg + " [cycle]")
+                continue
+            lines.append(prefix + pkg)
+            path.append(pkg)
+            on_path.add(pkg)
             children = deps_dict.get(pkg, [])
-            for i, child in enumerate(children):
+            child_base = prefix + ("│   " if prefix and not prefix.endswith("└── ") else "    ")
+            for i in range(len(children) - 1, -1, -1):
                 extension = "├── " if i < len(children) - 1 else "└── "
-                print_tree(child, prefix + ("│   " if prefix and not prefix.endswith("└── ") else "    ") + extension)
-
-        print_tree(root_package)
+                stack.append((children[i], child_base + extension, depth + 1))
+        sys.stdout.write("\n".join(lines) + "\n")
@@ -1,15 +1,48 @@
 import configparser
+import io
 import os
 import sys
+import gzip
 import json
-import urllib.request
-from urllib.error import URLError, HTTPError
-from urllib.parse import urljoin
-from collections import deque, defaultdict
+import re
+import hashlib
+import base64
+import tempfile
+import threading
+import traceback
+from array import array
+from urllib.parse import quote, unquote, urljoin, urlsplit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import shutil
 import subprocess
 import platform
 import argparse
 
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: поддерживается только формат INI
+    tomllib = None
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: быстрее разбирает JSON прямо из байтов
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # Потоковый разбор необязателен, без него читаем документ целиком
+    ijson = None
+
+# orjson.JSONDecodeError наследует json.JSONDecodeError, обработка ошибок общая
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Допустимые записи булевых значений в конфигурации
+_BOOL_MAP = {
+    'true': True, '1': True, 'yes': True, 'on': True,
+    'false': False, '0': False, 'no': False, 'off': False,
+}
+
 class ConfigError(Exception):
     """Базовый класс для ошибок конфигурации"""
     pass
@@ -18,6 +51,87 @@ class PackageFetchError(Exception):
     """Класс для ошибок получения данных пакета"""
     pass
 
+_SECTION_RE = re.compile(r'\[([^\]]+)\]\s*$')
+_OPTION_RE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*?)\s*$')
+
+def _fast_parse_config(data: str):
+    """
+    Разбирает INI-файл из плоских пар "ключ = значение" без создания ConfigParser
+    Возвращает: {секция: {ключ: значение}} или None, если в файле встречается синтаксис,
+    который нужно отдать configparser (продолжения строк, ':' , DEFAULT, повторы, ошибки)
+    """
+    sections = {}
+    current = None
+    # configparser делит текст только по '\n', splitlines разбил бы строку и по '\f', '\x85' и т.п.
+    for line in data.split('\n'):
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+        # Строка с отступом может быть продолжением значения
+        if line[0].isspace():
+            return None
+        match = _SECTION_RE.match(line)
+        if match:
+            name = match.group(1)
+            if name in sections or name == 'DEFAULT':
+                return None
+            current = sections[name] = {}
+            continue
+        match = _OPTION_RE.match(line)
+        if match is None or current is None:
+            return None
+        # configparser приводит ключи к нижнему регистру
+        key = match.group(1).lower()
+        if key in current:
+            return None
+        current[key] = match.group(2)
+    return sections
+
+def _to_csr(graph: dict):
+    """
+    Переводит граф {пакет: [зависимости]} в CSR-представление
+    Возвращает: (имена, {имя: индекс}, indptr, indices)
+    Зависимости вершины i - indices[indptr[i]:indptr[i + 1]]
+    """
+    names = list(graph)
+    index = {name: i for i, name in enumerate(names)}
+    indptr = array('i', [0])
+    indices = array('i')
+    # Зависимости, которых нет среди ключей, добавляются в конец names как вершины без ребер
+    # и обрабатываются этим же циклом
+    for name in names:
+        for dep in graph.get(name, ()):
+            i = index.get(dep)
+            if i is None:
+                i = index[dep] = len(names)
+                names.append(dep)
+            indices.append(i)
+        indptr.append(len(indices))
+    return names, index, indptr, indices
+
+# http.client (вместе с ssl) импортируется только при первом обращении к сети:
+# в режимах offline и test он не нужен, а его загрузка заметна на коротких запусках
+_http_client = None
+_BufferedHTTPResponse = None
+
+def _get_http():
+    """Лениво импортирует http.client и возвращает модуль"""
+    global _http_client, _BufferedHTTPResponse
+    if _http_client is None:
+        import http.client
+
+        class BufferedHTTPResponse(http.client.HTTPResponse):
+            """HTTP-ответ с увеличенным буфером чтения сокета"""
+            def __init__(self, sock, *args, **kwargs):
+                super().__init__(sock, *args, **kwargs)
+                # По умолчанию makefile() буферизует 8 КиБ - мало для многомегабайтных документов
+                self.fp.close()
+                self.fp = sock.makefile('rb', buffering=DependencyVisualizer.READ_BUFFER_SIZE)
+
+        _BufferedHTTPResponse = BufferedHTTPResponse
+        _http_client = http.client
+    return _http_client
+
 class DependencyVisualizer:
     REQUIRED_PARAMS = {
         'package_name': str,
@@ -29,39 +143,51 @@ class DependencyVisualizer:
         'plantuml_jar': str  # Для этапа 5
     }
     VALID_REPO_MODES = {'online', 'offline', 'test'}
+    # Имена пакетов тестового графа: большие латинские буквы
+    _PKG_NAME_RE = re.compile(r'[A-Z]+')
     NPM_REGISTRY_URL = 'https://registry.npmjs.org/'
+    # Сокращенные метаданные npm: только dist-tags и данные, нужные для установки (в 10-50 раз меньше)
+    NPM_ACCEPT = 'application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8'
     PLANTUML_URL = "https://sourceforge.net/projects/plantuml/files/plantuml.jar/download"
+    HTTP_TIMEOUT = 10
+    MAX_REDIRECTS = 5
+    REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+    MAX_FETCH_WORKERS = 16
+    READ_BUFFER_SIZE = 1 << 18
+    CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'depvis')
 
     def __init__(self, config_file):
         self.config_file = config_file
-        self.config = configparser.ConfigParser()
+        # Интерполяция значений не используется, поэтому хватает RawConfigParser
+        self.config = configparser.RawConfigParser()
         self.params = {}
         self.test_graph = None
         self.dependency_graph = {}
         self.cycles = []
+        self._local = threading.local()
+        self._deps_cache = {}
+        self._mode = None  # Нормализованный режим репозитория, задается в load_config
+        self._fetch_impl = None  # Загрузчик метаданных для режима, задается в load_config
+        self._base_url = None
+        self._proxies = None  # Прокси из окружения, читаются при первом соединении
+        self._latest_endpoint = True  # Реестр отдает манифест '<пакет>/latest'
+        self._java_cmd = None  # Путь к java, определяется при первой генерации PNG
 
     def load_config(self):
         """Загружает и валидирует конфигурацию"""
-        # Проверяем наличие файла
-        if not os.path.exists(self.config_file):
+        # Отсутствие файла обнаруживается при открытии, без отдельной проверки os.path.exists
+        try:
+            settings = self._read_settings()
+        except FileNotFoundError:
             print(f"Файл конфигурации '{self.config_file}' не найден в текущей директории.", file=sys.stderr)
             print(f"Текущая директория: {os.getcwd()}", file=sys.stderr)
             print("\nСоздание примера конфигурационного файла...", file=sys.stderr)
             self._create_example_config()
             raise ConfigError(f"Создан пример конфигурации в '{self.config_file}'. Отредактируйте его и запустите программу снова.")
         
-        try:
-            self.config.read(self.config_file)
-        except configparser.Error as e:
-            raise ConfigError(f"Ошибка чтения конфигурации: {str(e)}")
-        
-        # Проверяем наличие секции настроек
-        if not self.config.has_section('settings'):
-            raise ConfigError(f"Отсутствует секция [settings] в конфигурационном файле")
-        
         # Загружаем параметры с валидацией
         for param, param_type in self.REQUIRED_PARAMS.items():
-            if not self.config.has_option('settings', param):
+            if param not in settings:
                 # Для совместимости с предыдущими этапами
                 if param in ('load_order', 'plantuml_jar'):
                     default_value = "false" if param == 'load_order' else ""
@@ -69,19 +195,27 @@ class DependencyVisualizer:
                     continue
                 raise ConfigError(f"Отсутствует обязательный параметр: {param}")
             
-            raw_value = self.config.get('settings', param).strip()
+            raw_value = settings[param].strip()
             try:
                 self.params[param] = self._convert_value(raw_value, param_type)
             except ValueError as e:
                 raise ConfigError(f"Некорректное значение для '{param}': {str(e)}")
         
-        # Валидация режима репозитория
-        mode = self.params['repository_mode'].lower()
+        # Валидация режима репозитория; храним его в нижнем регистре, чтобы не приводить при каждом запросе
+        mode = self.params['repository_mode'] = self.params['repository_mode'].lower()
         if mode not in self.VALID_REPO_MODES:
             raise ConfigError(
                 f"Некорректный режим репозитория: {mode}. "
                 f"Допустимые значения: {', '.join(self.VALID_REPO_MODES)}"
             )
+        self._mode = mode
+        # Префикс URL реестра вычисляется один раз, а не при каждом запросе
+        self._base_url = (self.params['repository_path'] or self.NPM_REGISTRY_URL).rstrip('/') + '/'
+        self._fetch_impl = {
+            'online': self._fetch_online,
+            'offline': self._fetch_offline,
+            'test': self._fetch_test,
+        }[mode]
         
         # Загрузка тестового графа для режима 'test'
         if mode == 'test':
@@ -96,9 +230,62 @@ class DependencyVisualizer:
                 raise ConfigError(f"Файл plantuml.jar не найден по пути: {jar_path}\n"
                                  f"Скачайте его с: {self.PLANTUML_URL}")
 
+    def _read_settings(self) -> dict:
+        """
+        Читает секцию [settings] конфигурации и возвращает её как {параметр: строка}
+        Файлы *.toml разбираются встроенным tomllib (C-парсер), остальные - быстрым
+        построчным разбором с откатом на configparser
+        """
+        if self.config_file.lower().endswith('.toml'):
+            if tomllib is None:
+                raise ConfigError("Для конфигурации в формате TOML требуется Python 3.11+")
+            try:
+                with open(self.config_file, 'rb') as f:
+                    data = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ConfigError(f"Ошибка чтения конфигурации: {str(e)}")
+            
+            settings = data.get('settings')
+            if not isinstance(settings, dict):
+                raise ConfigError(f"Отсутствует секция [settings] в конфигурационном файле")
+            # Значения TOML типизированы; приводим к строкам, как их отдает configparser
+            return {key: str(value) for key, value in settings.items()}
+        
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            data = f.read()
+        
+        sections = _fast_parse_config(data)
+        if sections is not None:
+            if 'settings' not in sections:
+                raise ConfigError(f"Отсутствует секция [settings] в конфигурационном файле")
+            return sections['settings']
+        
+        # Синтаксис сложнее плоских пар "ключ = значение" - разбираем полноценным configparser
+        try:
+            self.config.read_string(data, source=self.config_file)
+        except configparser.Error as e:
+            raise ConfigError(f"Ошибка чтения конфигурации: {str(e)}")
+        
+        # Проверяем наличие секции настроек
+        if not self.config.has_section('settings'):
+            raise ConfigError(f"Отсутствует секция [settings] в конфигурационном файле")
+        return dict(self.config.items('settings'))
+
     def _create_example_config(self):
-        """Создает пример конфигурационного файла"""
-        example_config = f"""[settings]
+        """Создает пример конфигурационного файла (TOML для *.toml, иначе INI)"""
+        if self.config_file.lower().endswith('.toml'):
+            # В TOML строки берутся в кавычки, а булевы значения пишутся без них
+            example_config = f"""[settings]
+package_name = "express"
+repository_path = "{self.NPM_REGISTRY_URL}"
+repository_mode = "online"
+output_image = "dependency_graph.png"
+ascii_tree = true
+load_order = true
+plantuml_jar = "./plantuml.jar"
+"""
+        else:
+            example_config = f"""[settings]
 package_name = express
 repository_path = {self.NPM_REGISTRY_URL}
 repository_mode = online
@@ -134,104 +321,289 @@ plantuml_jar = ./plantuml.jar
                              f"Создайте файл с графом зависимостей или измените путь в конфигурации.")
         
         try:
-            with open(test_file, 'r', encoding='utf-8') as f:
-                self.test_graph = json.load(f)
+            with open(test_file, 'rb') as f:
+                test_graph = self.test_graph = _json_loads(f.read())
         except json.JSONDecodeError as e:
             raise ConfigError(f"Ошибка разбора JSON в тестовом файле: {str(e)}")
         except Exception as e:
             raise ConfigError(f"Ошибка загрузки тестового файла: {str(e)}")
         
         # Валидация структуры тестового графа
-        if not isinstance(self.test_graph, dict):
+        if not isinstance(test_graph, dict):
             raise ConfigError("Тестовый файл должен содержать JSON-объект")
         
-        for package, deps in self.test_graph.items():
-            if not package.isupper() or not package.isalpha():
-                raise ConfigError(f"Некорректное имя пакета в тестовом режиме: '{package}'. "
-                                  "Должны быть большие латинские буквы")
+        is_valid_name = self._PKG_NAME_RE.fullmatch
+        bad = next((package for package in test_graph if not is_valid_name(package)), None)
+        if bad is not None:
+            raise ConfigError(f"Некорректное имя пакета в тестовом режиме: '{bad}'. "
+                              "Должны быть большие латинские буквы")
+        
+        # Каждое имя зависимости проверяется один раз, сколько бы пакетов на него ни ссылалось
+        checked = set(test_graph)
+        for package, deps in test_graph.items():
             if not isinstance(deps, list):
                 raise ConfigError(f"Зависимости для '{package}' должны быть списком")
             for dep in deps:
-                if not dep.isupper() or not dep.isalpha():
+                if dep in checked:
+                    continue
+                if not is_valid_name(dep):
                     raise ConfigError(f"Некорректная зависимость '{dep}' для пакета '{package}'. "
                                       "Должны быть большие латинские буквы")
+                checked.add(dep)
+        
+        # Интернированные имена: один объект строки на пакет, сравнения ключей graph - по указателю
+        intern = sys.intern
+        self.test_graph = {intern(package): [intern(dep) for dep in deps]
+                           for package, deps in test_graph.items()}
 
     def _convert_value(self, value: str, target_type):
         """Преобразует строковое значение к целевому типу"""
         if target_type is bool:
-            if value.lower() in ('true', '1', 'yes', 'on'):
-                return True
-            if value.lower() in ('false', '0', 'no', 'off'):
-                return False
-            raise ValueError("ожидалось булево значение (true/false)")
+            result = _BOOL_MAP.get(value.lower())
+            if result is None:
+                raise ValueError("ожидалось булево значение (true/false)")
+            return result
         return target_type(value) if value else target_type()
 
     def print_config(self):
         """Выводит параметры конфигурации"""
-        print("Текущие параметры конфигурации:")
-        print("-" * 40)
+        lines = ["Текущие параметры конфигурации:", "-" * 40]
         for param, value in self.params.items():
             if param == 'plantuml_jar' and value:
                 value = os.path.basename(value) if os.path.exists(value) else value
-            print(f"{param.replace('_', ' ').title()}: {value}")
-        if self.params['repository_mode'].lower() == 'test' and self.test_graph:
-            print("\nТестовый граф:")
-            for pkg, deps in self.test_graph.items():
-                print(f"  {pkg} -> {', '.join(deps) if deps else '(нет зависимостей)'}")
-        print("-" * 40)
+            lines.append(f"{param.replace('_', ' ').title()}: {value}")
+        if self._mode == 'test' and self.test_graph:
+            lines.append("\nТестовый граф:")
+            lines.extend(f"  {pkg} -> {', '.join(deps) if deps else '(нет зависимостей)'}"
+                         for pkg, deps in self.test_graph.items())
+        lines.append("-" * 40)
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def fetch_package_data(self, package_name: str) -> dict:
         """
         Получает метаданные пакета в зависимости от режима репозитория
+        Реализация для режима выбирается один раз в load_config
         """
-        mode = self.params['repository_mode'].lower()
-        repo_path = self.params['repository_path']
-        
-        # Для тестового режима генерируем искусственные данные
-        if mode == 'test':
-            if package_name not in self.test_graph:
-                raise PackageFetchError(f"Пакет '{package_name}' отсутствует в тестовом графе")
-            dependencies = {dep: "1.0.0" for dep in self.test_graph[package_name]}
-            return {
-                "dist-tags": {"latest": "1.0.0"},
-                "versions": {
-                    "1.0.0": {
-                        "dependencies": dependencies
-                    }
-                }
-            }
-        
         try:
-            if mode == 'online':
-                base_url = repo_path if repo_path else self.NPM_REGISTRY_URL
-                url = urljoin(base_url.rstrip('/') + '/', package_name)
-                print(f"Запрос данных для пакета '{package_name}' из {url}...")
-                with urllib.request.urlopen(url, timeout=10) as response:
-                    if response.status != 200:
-                        raise PackageFetchError(f"Пакет не найден (HTTP {response.status})")
-                    return json.loads(response.read().decode('utf-8'))
-            
-            elif mode == 'offline':
-                file_path = os.path.join(repo_path, f"{package_name}.json")
-                print(f"Чтение данных для пакета '{package_name}' из {file_path}...")
-                if not os.path.exists(file_path):
-                    raise PackageFetchError(f"Файл метаданных не найден: {file_path}")
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        
-        except (URLError, HTTPError) as e:
-            raise PackageFetchError(f"Ошибка сети: {str(e)}")
+            return self._fetch_impl(package_name)
+        except PackageFetchError:
+            raise
         except json.JSONDecodeError as e:
             raise PackageFetchError(f"Ошибка разбора JSON: {str(e)}")
         except Exception as e:
             raise PackageFetchError(f"Неизвестная ошибка: {str(e)}")
 
-    def get_direct_dependencies(self, package_name: str) -> dict:
+    def _fetch_test(self, package_name: str) -> dict:
+        """Тестовый граф читается напрямую в get_direct_dependencies"""
+        raise PackageFetchError("В тестовом режиме метаданные пакетов не загружаются")
+
+    def _fetch_online(self, package_name: str) -> dict:
+        """
+        Загружает метаданные пакета из npm-реестра
+        Сначала запрашивается манифест последней версии ('<пакет>/latest', обычно единицы КиБ);
+        если реестр его не отдает, используется полный документ пакета
+        """
+        url = self._base_url + quote(package_name, safe='@/')
+        # Один вызов write на строку, чтобы вывод потоков не перемешивался
+        print(f"Запрос данных для пакета '{package_name}' из {url}...\n", end='')
+        
+        if self._latest_endpoint:
+            # Любой статус, кроме 200/304, означает, что '/latest' недоступен: идем за полным документом
+            body = self._get_registry_body(url + '/latest', probe=True)
+            if body is not None:
+                return _json_loads(body)
+        
+        body = self._get_registry_body(url)
+        if body is None:
+            raise PackageFetchError("Пакет не найден (HTTP 404)")
+        if self._latest_endpoint:
+            # Пакет есть, а манифеста нет: реестр не поддерживает '/latest', больше не пробуем
+            self._latest_endpoint = False
+        return self._parse_registry_document(io.BytesIO(body))
+
+    def _get_registry_body(self, url: str, probe: bool = False):
+        """
+        Выполняет запрос к реестру с проверкой ETag по дисковому кэшу
+        Возвращает тело ответа или None, если ресурс не найден (HTTP 404)
+        probe: пробный запрос, None возвращается при любом статусе, кроме 200/304
+        """
+        cache_path = os.path.join(self.CACHE_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest())
+        etag_path = cache_path + '.etag'
+        headers = {'Accept': self.NPM_ACCEPT}
+        if os.path.exists(cache_path) and os.path.exists(etag_path):
+            with open(etag_path, 'r', encoding='utf-8') as f:
+                headers['If-None-Match'] = f.read().strip()
+        
+        status, response_headers, body = self._http_get(url, headers)
+        if status == 304:
+            with open(cache_path, 'rb') as f:
+                return f.read()
+        if status == 404 or (probe and status != 200):
+            return None
+        if status != 200:
+            raise PackageFetchError(f"Пакет не найден (HTTP {status})")
+        if response_headers.get('ETag'):
+            self._write_cache(cache_path, body, response_headers['ETag'])
+        return body
+
+    def _fetch_offline(self, package_name: str) -> dict:
+        """Читает метаданные пакета из файла '<пакет>.json' локального репозитория"""
+        file_path = os.path.join(self.params['repository_path'], f"{package_name}.json")
+        print(f"Чтение данных для пакета '{package_name}' из {file_path}...\n", end='')
+        if not os.path.exists(file_path):
+            raise PackageFetchError(f"Файл метаданных не найден: {file_path}")
+        with open(file_path, 'rb', buffering=self.READ_BUFFER_SIZE) as f:
+            return self._parse_registry_document(f)
+
+    def _parse_registry_document(self, stream) -> dict:
         """
-        Извлекает прямые зависимости для последней версии пакета
+        Разбирает документ реестра npm из бинарного потока с поддержкой seek,
+        оставляя только dist-tags.latest и данные этой версии
+        Остальные версии (для популярных пакетов - тысячи записей) не материализуются
         """
+        if ijson is None:
+            return _json_loads(stream.read())
+        
+        try:
+            latest = next(ijson.items(stream, 'dist-tags.latest'), None)
+            if latest is None:
+                return {}
+            stream.seek(0)
+            version_data = next(ijson.items(stream, f'versions.{latest}'), None)
+        except ijson.JSONError as e:
+            raise PackageFetchError(f"Ошибка разбора JSON: {str(e)}")
+        
+        versions = {latest: version_data} if version_data is not None else {}
+        return {"dist-tags": {"latest": latest}, "versions": versions}
+
+    def _write_cache(self, cache_path: str, body: bytes, etag: str):
+        """Атомарно сохраняет ответ реестра и его ETag в дисковый кэш"""
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            for path, data in ((cache_path, body), (cache_path + '.etag', etag.encode('utf-8'))):
+                fd, tmp_path = tempfile.mkstemp(dir=self.CACHE_DIR)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                # os.replace атомарен, поэтому параллельные запуски не портят записи
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Предупреждение: не удалось сохранить кэш {cache_path}: {e}", file=sys.stderr)
+
+    def _http_get(self, url: str, headers=None):
+        """
+        Выполняет GET-запрос через постоянное (keep-alive) соединение потока
+        Перенаправления (3xx с заголовком Location) отслеживаются, как это делал urlopen
+        Возвращает: (HTTP-статус, заголовки ответа, тело ответа в байтах)
+        """
+        for _ in range(self.MAX_REDIRECTS + 1):
+            status, response_headers, body = self._http_request(url, headers)
+            location = response_headers.get('Location')
+            if status not in self.REDIRECT_STATUSES or not location:
+                return status, response_headers, body
+            url = urljoin(url, location)
+        raise PackageFetchError(f"Слишком много перенаправлений: {url}")
+
+    def _http_request(self, url: str, headers=None):
+        """Выполняет один GET-запрос без обработки перенаправлений"""
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        
+        # У каждого потока свой набор соединений: http.client не потокобезопасен
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = (parts.scheme, parts.netloc)
+        http_client = _get_http()
+        request_headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip', **(headers or {})}
+        
+        for attempt in range(2):
+            entry = connections.get(key)
+            if entry is None:
+                entry = connections[key] = self._open_connection(parts)
+            conn, prefix, proxy_headers = entry
+            try:
+                conn.request('GET', prefix + path, headers={**request_headers, **proxy_headers})
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (http_client.HTTPException, OSError) as e:
+                # Сервер мог закрыть простаивающее соединение - переподключаемся один раз
+                conn.close()
+                del connections[key]
+                if attempt:
+                    # Сетевые ошибки определяются здесь: OSError файлов и вывода в других местах
+                    # не должен выдаваться за "Ошибку сети"
+                    raise PackageFetchError(f"Ошибка сети: {str(e)}")
+        
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return response.status, response.headers, body
+
+    def _open_connection(self, parts):
+        """
+        Создает соединение с сервером из URL или с прокси, заданным для его схемы
+        (HTTP_PROXY/HTTPS_PROXY с учетом NO_PROXY, как в urllib)
+        Возвращает: (соединение, префикс пути запроса, заголовки для прокси)
+        """
+        http_client = _get_http()
+        https = parts.scheme == 'https'
+        conn_class = http_client.HTTPSConnection if https else http_client.HTTPConnection
+        prefix, proxy_headers = '', {}
+        
+        proxy = self._proxy_for(parts)
+        if proxy is None:
+            conn = conn_class(parts.netloc, timeout=self.HTTP_TIMEOUT)
+        else:
+            proxy_parts = urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+            if proxy_parts.username is not None:
+                credentials = f"{unquote(proxy_parts.username)}:{unquote(proxy_parts.password or '')}"
+                proxy_headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+            conn = conn_class(proxy_parts.hostname, proxy_parts.port, timeout=self.HTTP_TIMEOUT)
+            if https:
+                # HTTPS проходит через туннель CONNECT, внутри туннеля запросы обычные
+                conn.set_tunnel(parts.netloc, headers=proxy_headers)
+                proxy_headers = {}
+            else:
+                # HTTP-прокси ожидает в строке запроса абсолютный URL
+                prefix = f"{parts.scheme}://{parts.netloc}"
+        conn.response_class = _BufferedHTTPResponse
+        return conn, prefix, proxy_headers
+
+    def _proxy_for(self, parts):
+        """Возвращает адрес прокси для URL или None, если прокси не задан или хост в NO_PROXY"""
+        # urllib.request нужен только здесь, при открытии нового соединения
+        import urllib.request
+        if self._proxies is None:
+            self._proxies = urllib.request.getproxies()
+        proxy = self._proxies.get(parts.scheme)
+        if not proxy or urllib.request.proxy_bypass(parts.netloc):
+            return None
+        return proxy
+
+    def get_direct_dependencies(self, package_name: str) -> list:
+        """
+        Извлекает имена прямых зависимостей для последней версии пакета
+        Результат запоминается: повторные запросы пакета не обращаются к репозиторию
+        """
+        if self._mode == 'test':
+            deps = self.test_graph.get(package_name)
+            if deps is None:
+                raise PackageFetchError(f"Пакет '{package_name}' отсутствует в тестовом графе")
+            return deps
+        
+        cached = self._deps_cache.get(package_name)
+        if cached is not None:
+            return cached
+        
         package_data = self.fetch_package_data(package_name)
         
+        # Манифест одной версии (ответ '<пакет>/latest'): зависимости лежат на верхнем уровне
+        if 'versions' not in package_data and 'version' in package_data:
+            dependencies = self._deps_cache[package_name] = list(map(sys.intern, package_data.get('dependencies') or {}))
+            return dependencies
+        
         # Получаем последнюю версию из dist-tags
         dist_tags = package_data.get('dist-tags', {})
         if not dist_tags or 'latest' not in dist_tags:
@@ -246,168 +618,241 @@ plantuml_jar = ./plantuml.jar
             )
         
         version_data = versions[latest_version]
-        return version_data.get('dependencies', {})
+        # Имена из разных документов - разные объекты; интернирование делает их общими для всего графа
+        dependencies = self._deps_cache[package_name] = list(map(sys.intern, version_data.get('dependencies', {})))
+        return dependencies
+
+    def get_direct_dependencies_batch(self, package_names, executor):
+        """
+        Параллельно получает прямые зависимости для списка пакетов
+        Возвращает: {пакет: (зависимости, ошибка)}
+        """
+        get_deps = self.get_direct_dependencies
+        
+        def fetch(package):
+            try:
+                return get_deps(package), None
+            except PackageFetchError as e:
+                return [], e
+        
+        return dict(zip(package_names, executor.map(fetch, package_names)))
 
     def build_dependency_graph(self, start_package: str):
         """
-        Строит граф зависимостей с использованием рекурсивного BFS
+        Строит граф зависимостей итеративным BFS по уровням
+        Пакеты одного уровня загружаются параллельно
         Возвращает: (граф, циклы)
         Граф: {пакет: [зависимости]}
         Циклы: список кортежей (начальный_пакет, зависимость) для циклических связей
         """
-        visited = set()
+        # Ключи graph и есть множество посещенных пакетов: отдельный visited не нужен
         graph = {}
-        cycles = []
-        level_queue = deque([start_package])
-
-        def bfs_recursive(current_level):
-            """Рекурсивная реализация BFS по уровням"""
-            if not current_level:
-                return
-            
-            next_level = deque()
-            
-            for package in current_level:
-                if package in visited:
-                    continue
+        current_level = deque([start_package])
+        # Множества дублируют очереди уровней для проверки вхождения за O(1)
+        current_level_set = {start_package}
+        get_batch = self.get_direct_dependencies_batch
+        
+        with ThreadPoolExecutor(max_workers=self.MAX_FETCH_WORKERS) as executor:
+            while current_level:
+                next_level = deque()
+                next_level_set = set()
+                # Методы внутреннего цикла связываются с локальными именами один раз на уровень
+                next_append = next_level.append
+                next_add = next_level_set.add
+                pending = [package for package in current_level if package not in graph]
+                fetched = get_batch(pending, executor)
                 
-                visited.add(package)
-                try:
-                    deps_dict = self.get_direct_dependencies(package)
-                    dependencies = list(deps_dict.keys())
-                except PackageFetchError as e:
-                    print(f"Предупреждение: не удалось загрузить зависимости для {package}: {e}", file=sys.stderr)
-                    dependencies = []
+                for package in current_level:
+                    if package in graph:
+                        continue
+                    
+                    dependencies, error = fetched[package]
+                    if error is not None:
+                        print(f"Предупреждение: не удалось загрузить зависимости для {package}: {error}", file=sys.stderr)
+                    
+                    graph[package] = dependencies
+                    
+                    for dep in dependencies:
+                        if dep not in graph and dep not in next_level_set and dep not in current_level_set:
+                            next_append(dep)
+                            next_add(dep)
                 
-                graph[package] = dependencies
-                
-                # Обработка зависимостей и обнаружение циклов
-                for dep in dependencies:
-                    if dep in visited:
-                        cycles.append((package, dep))
-                    elif dep not in next_level and dep not in current_level:
-                        next_level.append(dep)
-            
-            bfs_recursive(next_level)
+                current_level = next_level
+                current_level_set = next_level_set
         
-        bfs_recursive(level_queue)
         self.dependency_graph = graph
+        cycles = self._find_cycles(graph, start_package)
         self.cycles = cycles
         return graph, cycles
 
+    def _find_cycles(self, graph: dict, start_package: str):
+        """
+        Ищет циклические связи итеративным DFS с раскраской вершин за O(V+E)
+        Цвета: 0 - не посещена, 1 - в стеке обхода, 2 - обработана
+        В результат попадают только обратные ребра, ромбовидные зависимости циклами не считаются
+        Обход идет по CSR-представлению графа: индексы в массивах вместо поиска в словарях
+        CSR строится заново при каждом вызове (O(V+E), как и сам обход), поэтому
+        изменения графа на месте всегда учитываются
+        """
+        names, index, indptr, indices = _to_csr(graph)
+        cycles = []
+        if start_package not in index:
+            return cycles
+        
+        color = bytearray(len(names))
+        # Позиция следующего непросмотренного ребра для каждой вершины
+        next_edge = array('i', indptr[:-1])
+        start = index[start_package]
+        color[start] = 1
+        stack = [start]
+        
+        while stack:
+            node = stack[-1]
+            edge = next_edge[node]
+            if edge == indptr[node + 1]:
+                color[node] = 2
+                stack.pop()
+                continue
+            
+            next_edge[node] = edge + 1
+            dep = indices[edge]
+            state = color[dep]
+            if state == 1:
+                cycles.append((names[node], names[dep]))
+            elif state == 0:
+                color[dep] = 1
+                stack.append(dep)
+        
+        return cycles
+
     def topological_sort(self):
         """
         Выполняет топологическую сортировку графа (алгоритм Кана)
         Возвращает порядок загрузки зависимостей
         """
-        graph = self.dependency_graph.copy()
-        in_degree = defaultdict(int)
-        
-        # Инициализация степеней захода
-        for node in graph:
-            in_degree[node] = 0
-        
-        for deps in graph.values():
-            for dep in deps:
-                in_degree[dep] += 1
+        # Вершины нумеруются, степени захода хранятся в плоском массиве
+        names, index, indptr, indices = _to_csr(self.dependency_graph)
+        in_degree = array('i', [0]) * len(names)
+        for dep in indices:
+            in_degree[dep] += 1
         
         # Очередь узлов со степенью захода 0
-        queue = deque([node for node, degree in in_degree.items() if degree == 0])
-        order = []
-        visited = set()
+        queue = deque([node for node, degree in enumerate(in_degree) if degree == 0])
+        int_order = []
         
         while queue:
             node = queue.popleft()
-            order.append(node)
-            visited.add(node)
+            int_order.append(node)
             
-            for neighbor in graph.get(node, []):
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[edge]
                 in_degree[neighbor] -= 1
                 if in_degree[neighbor] == 0:
                     queue.append(neighbor)
         
+        order = [names[node] for node in int_order]
+        
         # Проверка на циклы
-        if len(order) != len(in_degree):
-            remaining = set(in_degree.keys()) - visited
+        if len(order) != len(names):
+            remaining = set(names) - set(order)
             print("\nПредупреждение: обнаружены циклы, топологическая сортировка неполная", file=sys.stderr)
             print(f"Узлы в циклах: {', '.join(remaining)}", file=sys.stderr)
         
         return order
 
-    def generate_plantuml_code(self):
+    _PLANTUML_HEADER = (
+        b"@startuml\n"
+        b"skinparam backgroundColor #EEEBDC\n"
+        b"skinparam shadowing false\n"
+        b"skinparam ArrowColor #333333\n"
+        b"skinparam NodeColor #F0F0F0\n"
+        b"skinparam NodeBorderColor #888888\n"
+        b"skinparam NodeFontSize 14"
+    )
+
+    def generate_plantuml_bytes(self) -> bytes:
         """
-        Генерирует PlantUML-код для визуализации графа зависимостей
+        Генерирует PlantUML-код для визуализации графа зависимостей сразу в UTF-8
+        Имя каждого пакета кодируется один раз; результат передается в PlantUML без перекодирования
         """
-        plantuml = ["@startuml"]
-        plantuml.append("skinparam backgroundColor #EEEBDC")
-        plantuml.append("skinparam shadowing false")
-        plantuml.append("skinparam ArrowColor #333333")
-        plantuml.append("skinparam NodeColor #F0F0F0")
-        plantuml.append("skinparam NodeBorderColor #888888")
-        plantuml.append("skinparam NodeFontSize 14")
+        graph = self.dependency_graph
+        encoded = {}
+        def enc(name):
+            b = encoded.get(name)
+            if b is None:
+                b = encoded[name] = name.encode('utf-8')
+            return b
         
         # Добавление узлов
-        for node in self.dependency_graph.keys():
-            plantuml.append(f"node \"{node}\" as {node}")
+        lines = [self._PLANTUML_HEADER]
+        lines.extend(b'node "%s" as %s' % (enc(node), enc(node)) for node in graph)
         
         # Добавление ребер с выделением циклов
-        cycle_edges = set(self.cycles)
-        for node, deps in self.dependency_graph.items():
-            for dep in deps:
-                edge_style = " [color=red, style=bold]" if (node, dep) in cycle_edges else ""
-                plantuml.append(f"{node} --> {dep}{edge_style}")
+        cycle_edges = frozenset(self.cycles)
+        lines.extend(b"%s --> %s%s" % (enc(node), enc(dep),
+                                       b" [color=red, style=bold]" if (node, dep) in cycle_edges else b"")
+                     for node, deps in graph.items() for dep in deps)
         
         # Добавление пометки для циклов
         if self.cycles:
-            plantuml.append("\nlegend top")
-            plantuml.append("  <b>Циклические зависимости:</b>")
-            for src, dst in self.cycles:
-                plantuml.append(f"  {src} --> {dst}")
-            plantuml.append("endlegend")
+            lines.append(b"\nlegend top")
+            lines.append("  <b>Циклические зависимости:</b>".encode('utf-8'))
+            lines.extend(b"  %s --> %s" % (enc(src), enc(dst)) for src, dst in self.cycles)
+            lines.append(b"endlegend")
         
-        plantuml.append("@enduml")
-        return "\n".join(plantuml)
+        lines.append(b"@enduml")
+        return b"\n".join(lines)
+
+    def generate_plantuml_code(self):
+        """
+        Генерирует PlantUML-код для визуализации графа зависимостей
+        """
+        return self.generate_plantuml_bytes().decode('utf-8')
+
+    def _resolve_java(self) -> str:
+        """
+        Находит исполняемый файл java в PATH (один раз за запуск)
+        Поиск по PATH заменяет проверку 'java -version', которая сама стоила запуска JVM
+        """
+        if self._java_cmd is None:
+            java_cmd = "java.exe" if platform.system() == "Windows" else "java"
+            java_path = shutil.which(java_cmd)
+            if java_path is None:
+                raise FileNotFoundError(java_cmd)
+            self._java_cmd = java_path
+        return self._java_cmd
 
     def generate_png_from_plantuml(self, puml_content):
         """
-        Генерирует PNG-изображение из PlantUML-кода
+        Генерирует PNG-изображение из PlantUML-кода (str или готовые UTF-8 байты)
         """
         output_path = self.params['output_image']
-        puml_path = os.path.splitext(output_path)[0] + ".puml"
         
         # Создаем директорию для вывода, если её нет
         output_dir = os.path.dirname(os.path.abspath(output_path))
         os.makedirs(output_dir, exist_ok=True)
         
-        # Сохраняем PlantUML-код в файл
-        with open(puml_path, 'w', encoding='utf-8') as f:
-            f.write(puml_content)
-        
         jar_path = self.params['plantuml_jar']
         try:
-            # Определяем путь к java
-            java_cmd = "java"
-            if platform.system() == "Windows":
-                java_cmd = "java.exe"
+            java_cmd = self._resolve_java()
             
-            # Проверяем наличие java
-            subprocess.run([java_cmd, "-version"], capture_output=True, text=True, check=True)
-            
-            # Выполняем команду PlantUML
+            # PlantUML в режиме -pipe читает код из stdin и отдает PNG в stdout: промежуточный .puml не нужен
             result = subprocess.run(
-                [java_cmd, "-jar", jar_path, puml_path, "-tpng"],
+                [java_cmd, "-jar", jar_path, "-pipe", "-tpng"],
+                input=puml_content if isinstance(puml_content, bytes) else puml_content.encode('utf-8'),
                 capture_output=True,
-                text=True,
                 check=True
             )
+            with open(output_path, 'wb') as f:
+                f.write(result.stdout)
             
             print(f"\nИзображение успешно сохранено: {output_path}")
-            print(f"PlantUML-код сохранен: {puml_path}")
             
             return True
         except subprocess.CalledProcessError as e:
-            print(f"Ошибка генерации PNG: {e.stderr or e.stdout}", file=sys.stderr)
-            print(f"Команда: java -jar {jar_path} {puml_path} -tpng", file=sys.stderr)
+            details = (e.stderr or e.stdout or b'').decode('utf-8', errors='replace')
+            print(f"Ошибка генерации PNG: {details}", file=sys.stderr)
+            print(f"Команда: java -jar {jar_path} -pipe -tpng", file=sys.stderr)
             return False
         except FileNotFoundError:
             print(f"Java не найдена. Убедитесь, что Java установлена и добавлена в PATH", file=sys.stderr)
@@ -422,38 +867,51 @@ plantuml_jar = ./plantuml.jar
 
     def print_dependency_tree(self, graph: dict, start_package: str):
         """Выводит дерево зависимостей в формате ASCII"""
-        print(f"\nДерево зависимостей для '{start_package}':")
-        
-        def print_node(package, prefix="", is_last=True, visited=None):
-            if visited is None:
-                visited = set()
+        lines = [f"\nДерево зависимостей для '{start_package}':"]
+        
+        # Явный стек вместо рекурсии: глубокие графы не упираются в лимит рекурсии.
+        # Цикл определяется по пакетам на текущем пути от корня, как и раньше.
+        # Обход идет по индексам CSR-представления переданного графа;
+        # принадлежность пути хранится в bytearray по индексу вершины
+        names, index, indptr, indices = _to_csr(graph)
+        start = index.get(start_package)
+        if start is None:
+            lines.append(f"└── {start_package}")
+            sys.stdout.write("\n".join(lines) + "\n")
+            return
+        path = []
+        on_path = bytearray(len(names))
+        stack = [(start, "", True, 0)]
+        
+        while stack:
+            node, prefix, is_last, depth = stack.pop()
+            for ancestor in path[depth:]:
+                on_path[ancestor] = 0
+            del path[depth:]
             
-            if package in visited:
-                connector = "└── " if is_last else "├── "
-                print(f"{prefix}{connector}{package} [цикл]")
-                return
-            
-            visited.add(package)
             connector = "└── " if is_last else "├── "
-            print(f"{prefix}{connector}{package}")
+            if on_path[node]:
+                lines.append(f"{prefix}{connector}{names[node]} [цикл]")
+                continue
             
-            new_prefix = prefix + ("    " if is_last else "│   ")
-            deps = graph.get(package, [])
+            lines.append(f"{prefix}{connector}{names[node]}")
+            path.append(node)
+            on_path[node] = 1
             
-            for i, dep in enumerate(deps):
-                is_last_dep = (i == len(deps) - 1)
-                print_node(dep, new_prefix, is_last_dep, visited.copy())
+            new_prefix = prefix + ("    " if is_last else "│   ")
+            first, last = indptr[node], indptr[node + 1] - 1
+            for i in range(last, first - 1, -1):
+                stack.append((indices[i], new_prefix, i == last, depth + 1))
         
-        print_node(start_package)
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def print_load_order(self):
         """Выводит порядок загрузки зависимостей (этап 4)"""
         order = self.topological_sort()
-        print("\nПорядок загрузки зависимостей (топологическая сортировка):")
-        print("-" * 40)
-        for i, package in enumerate(order, 1):
-            print(f"{i}. {package}")
-        print("-" * 40)
+        lines = ["\nПорядок загрузки зависимостей (топологическая сортировка):", "-" * 40]
+        lines.extend(f"{i}. {package}" for i, package in enumerate(order, 1))
+        lines.append("-" * 40)
+        sys.stdout.write("\n".join(lines) + "\n")
         
         # Сравнение с npm
         print("\nСравнение с npm:")
@@ -475,16 +933,16 @@ plantuml_jar = ./plantuml.jar
             self.build_dependency_graph(start_package)
             
             # Вывод результатов построения графа
-            print("\nПостроенный граф зависимостей:")
-            print("-" * 40)
-            for package, deps in self.dependency_graph.items():
-                print(f"{package} -> {', '.join(deps) if deps else '(нет зависимостей)'}")
-            print("-" * 40)
+            lines = ["\nПостроенный граф зависимостей:", "-" * 40]
+            lines.extend(f"{package} -> {', '.join(deps) if deps else '(нет зависимостей)'}"
+                         for package, deps in self.dependency_graph.items())
+            lines.append("-" * 40)
+            sys.stdout.write("\n".join(lines) + "\n")
             
             if self.cycles:
-                print("\nОбнаружены циклические зависимости:")
-                for src, dst in self.cycles:
-                    print(f"  {src} -> {dst} (цикл)")
+                lines = ["\nОбнаружены циклические зависимости:"]
+                lines.extend(f"  {src} -> {dst} (цикл)" for src, dst in self.cycles)
+                sys.stdout.write("\n".join(lines) + "\n")
             else:
                 print("\nЦиклические зависимости не обнаружены.")
             
@@ -494,7 +952,7 @@ plantuml_jar = ./plantuml.jar
             
             # Этап 5: Визуализация
             if self.params['output_image'] and self.params['output_image'].lower().endswith('.png'):
-                puml_code = self.generate_plantuml_code()
+                puml_code = self.generate_plantuml_bytes()
                 self.generate_png_from_plantuml(puml_code)
             
             # Вывод ASCII-дерева, если требуется
@@ -513,14 +971,13 @@ plantuml_jar = ./plantuml.jar
         
         except PackageFetchError as e:
             print(f"\nОШИБКА ЗАГРУЗКИ ДАННЫХ: {e}", file=sys.stderr)
-            if self.params.get('repository_mode', '').lower() == 'offline':
+            if self._mode == 'offline':
                 print("\nПодсказка для offline-режима:", file=sys.stderr)
                 print("Убедитесь, что в директории репозитория есть файлы вида '<пакет>.json'", file=sys.stderr)
             return 1
         
         except Exception as e:
             print(f"\nНЕОБРАБОТАННАЯ ОШИБКА: {e}", file=sys.stderr)
-            import traceback
             traceback.print_exc(file=sys.stderr)
             return 1
 
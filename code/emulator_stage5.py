@@ -1,73 +1,85 @@
 
 #!/usr/bin/env python3
 """Bash-like emulator - Stage 5 (final): adds chmod, mkdir, help, and full documentation."""
-import os, sys, shlex, getpass, socket, argparse, io, zipfile, base64, calendar
+import os, sys, shlex, getpass, socket, argparse, io, zipfile, base64, calendar, bisect
 from datetime import datetime
 from pathlib import PurePosixPath
 
+# Bit flags in InMemoryVFS._kind; a path can be both when an archive has a file and a directory of the same name
+_FILE, _DIR = 1, 2
+
 class InMemoryVFS:
     def __init__(self, zip_bytes: bytes):
         self._buf = io.BytesIO(zip_bytes)
         self._zip = zipfile.ZipFile(self._buf, mode='r')
-        self._names = set(self._zip.namelist())
-        self._dirs = set(n for n in self._names if n.endswith('/'))
-        for n in list(self._names):
-            if not n.endswith('/'):
-                parts = PurePosixPath(n).parts
-                for i in range(1, len(parts)):
-                    d = '/'.join(parts[:i]) + '/'
-                    self._dirs.add(d)
-        self._dirs.add('')
-        self._files = set(n for n in self._names if not n.endswith('/'))
+        self._names = set(map(sys.intern, self._zip.namelist()))
+        # path without slashes -> _FILE/_DIR flags: one dict probe answers is_dir and is_file.
+        # Sets are filled by comprehensions in one pass each, the dict via dict.fromkeys, not per-name adds
+        files = {n for n in self._names if not n.endswith('/')}
+        dirs = {n[:-1] for n in self._names if n.endswith('/')}
+        dirs.update('/'.join(parts[:i]) for parts in (PurePosixPath(n).parts for n in files) for i in range(1, len(parts)))
+        dirs.add('')
+        kind = self._kind = dict.fromkeys(files, _FILE)
+        kind.update(dict.fromkeys(dirs, _DIR))
+        kind.update(dict.fromkeys(files & dirs, _FILE | _DIR))
         self.perms = {name: 0o755 if name.endswith('/') else 0o644 for name in self._names}
+        # oct() strings for ls, kept in sync with perms by mkdir/chmod
+        self.perms_str = {name: oct(mode) for name, mode in self.perms.items()}
+        self._contents = {}
+        # directory -> sorted entries ('name/' for dirs), built once instead of scanning all names per listdir
+        self._children, seen = {}, set()
+        for name in sorted(self._names):
+            parts = [sys.intern(part) for part in name.rstrip('/').split('/')]
+            for i in range(len(parts)):
+                parent = '/'.join(parts[:i])
+                if (parent, parts[i]) in seen: continue
+                seen.add((parent, parts[i]))
+                child = parts[i] + ('/' if kind.get((parent + '/' if parent else '') + parts[i], 0) & _DIR else '')
+                self._children.setdefault(parent, []).append(child)
 
     def listdir(self, cwd: str):
-        prefix = cwd.rstrip('/') + ('/' if cwd and not cwd.endswith('/') else '')
-        seen, results = set(), []
-        for name in sorted(self._names):
-            if not name.startswith(prefix): continue
-            rest = name[len(prefix):]
-            if rest == '': continue
-            first = rest.split('/', 1)[0]
-            if first in seen: continue
-            seen.add(first)
-            results.append(first + ('/' if prefix + first + '/' in self._dirs else ''))
-        return results
+        return list(self._children.get(cwd.strip('/'), ()))
 
     def is_dir(self, path: str):
-        p = path.strip('/')
-        if p == '': return True
-        return (p + '/' in self._dirs)
+        return self._kind.get(path.strip('/'), 0) & _DIR != 0
 
     def is_file(self, path: str):
-        p = path.strip('/')
-        return p in self._files
+        return self._kind.get(path.strip('/'), 0) & _FILE != 0
 
     def read_file(self, path: str):
         p = path.strip('/')
-        if p not in self._files: return None
-        with self._zip.open(p, 'r') as f: return f.read()
+        data = self._contents.get(p)
+        if data is not None: return data
+        if not self._kind.get(p, 0) & _FILE: return None
+        # each member is decompressed once; later reads skip ZipFile.open and the decompressor setup
+        data = self._contents[p] = self._zip.read(p)
+        return data
 
     def mkdir(self, path: str):
         p = path.strip('/') + '/'
-        if p in self._dirs or p in self._files:
+        if self._kind.get(p[:-1], 0) & _DIR:
             raise FileExistsError(f"mkdir: cannot create directory '{path}': File exists")
         parent = '/'.join(p.strip('/').split('/')[:-1])
-        if parent and parent + '/' not in self._dirs:
+        if parent and not self._kind.get(parent, 0) & _DIR:
             raise FileNotFoundError(f"mkdir: cannot create directory '{path}': No such file or directory")
-        self._dirs.add(p); self._names.add(p); self.perms[p] = 0o755
+        self._kind[p[:-1]] = self._kind.get(p[:-1], 0) | _DIR; self._names.add(p)
+        self.perms[p] = 0o755; self.perms_str[p] = '0o755'
+        entries, name = self._children.setdefault(parent, []), p.rstrip('/').split('/')[-1]
+        if name in entries: entries[entries.index(name)] = name + '/'
+        else: bisect.insort(entries, name + '/')
 
     def chmod(self, path: str, mode: int):
         p = path.strip('/')
-        key = p + '/' if (p + '/') in self._dirs else p
+        key = p + '/' if self._kind.get(p, 0) & _DIR else p
         if key not in self.perms:
             raise FileNotFoundError(f"chmod: cannot access '{path}': No such file or directory")
-        self.perms[key] = mode
+        self.perms[key] = mode; self.perms_str[key] = oct(mode)
 
 class BashEmulator:
     def __init__(self, vfs_path=None, prompt=None, startup=None, debug=True):
         self.vfs_path, self.custom_prompt, self.startup_script = vfs_path, prompt, startup
         self.debug, self.cwd, self.running, self.vfs = debug, '', True, None
+        self.user, self.host = getpass.getuser(), socket.gethostname()
         if self.vfs_path: self._load_vfs(self.vfs_path)
         self.commands = {
             'ls': 'List directory contents',
@@ -89,18 +101,22 @@ class BashEmulator:
 
     def get_prompt(self):
         if self.custom_prompt: return self.custom_prompt
-        return f"{getpass.getuser()}@{socket.gethostname()}:{'/' + self.cwd if self.cwd else '/'}$ "
+        return f"{self.user}@{self.host}:{'/' + self.cwd if self.cwd else '/'}$ "
 
     def parse_input(self, line):
         if not line.strip(): return None, []
         parts = shlex.split(line); return parts[0], parts[1:] if parts else (None, [])
 
     def _resolve(self, path):
-        p = PurePosixPath(path)
-        if p.is_absolute(): return str(p).lstrip('/')
-        if self.cwd == '': base = PurePosixPath('.')
-        else: base = PurePosixPath(self.cwd)
-        return str((base / p)).strip('/')
+        # plain string handling instead of PurePosixPath objects; also collapses '.' and '..'
+        parts = path.split('/') if path.startswith('/') else (self.cwd + '/' + path).split('/')
+        out = []
+        for p in parts:
+            if not p or p == '.': continue
+            if p == '..':
+                if out: out.pop()
+            else: out.append(p)
+        return '/'.join(out)
 
     def cmd_ls(self, args):
         target = args[0] if args else '.'
@@ -109,14 +125,13 @@ class BashEmulator:
             print(f"ls: cannot access '{target}': No such file or directory")
             return
         if self.vfs.is_file(resolved):
-            perms = oct(self.vfs.perms.get(resolved, 0o644))
+            perms = self.vfs.perms_str.get(resolved, '0o644')
             print(f"{perms} {target}"); return
-        entries = self.vfs.listdir(resolved)
+        entries, perms_str = self.vfs.listdir(resolved), self.vfs.perms_str
         for e in entries:
             name = (resolved + '/' + e).strip('/')
-            key = name if name in self.vfs.perms else name + '/'
-            perms = oct(self.vfs.perms.get(key, 0o755))
-            print(f"{perms} {e}")
+            key = name if name in perms_str else name + '/'
+            print(f"{perms_str.get(key, '0o755')} {e}")
 
     def cmd_cd(self, args):
         target = args[0] if args else '/'
@@ -127,18 +142,20 @@ class BashEmulator:
         self.cwd = newp.strip('/')
 
     def cmd_tree(self, args):
-        def walk(path, prefix=''):
-            entries = self.vfs.listdir(path)
-            for i, e in enumerate(entries):
-                is_last = i == len(entries)-1
-                connector = '└── ' if is_last else '├── '
-                print(prefix + connector + e)
-                subpath = (path + '/' + e).strip('/')
-                if e.endswith('/') and self.vfs.is_dir(subpath):
-                    walk(subpath, prefix + ('    ' if is_last else '│   '))
-        start = self.cwd
-        print(f"./")
-        walk(start)
+        # explicit stack of (path, prefix, entries, next index) instead of recursing per directory
+        listdir, is_dir = self.vfs.listdir, self.vfs.is_dir
+        lines = ["./"]
+        stack = [(self.cwd, '', listdir(self.cwd), 0)]
+        while stack:
+            path, prefix, entries, i = stack.pop()
+            if i == len(entries): continue
+            stack.append((path, prefix, entries, i + 1))
+            e, is_last = entries[i], i == len(entries)-1
+            lines.append(prefix + ('└── ' if is_last else '├── ') + e)
+            subpath = (path + '/' + e).strip('/')
+            if e.endswith('/') and is_dir(subpath):
+                stack.append((subpath, prefix + ('    ' if is_last else '│   '), listdir(subpath), 0))
+        print('\n'.join(lines))
 
     def cmd_cal(self, args):
         now = datetime.now()
@@ -176,30 +193,36 @@ class BashEmulator:
         self.running = False
         return ("exit", code)
 
+    COMMAND_MAP = {
+        'ls': cmd_ls,
+        'cd': cmd_cd,
+        'tree': cmd_tree,
+        'cal': cmd_cal,
+        'mkdir': cmd_mkdir,
+        'chmod': cmd_chmod,
+        'help': cmd_help,
+        'exit': cmd_exit,
+    }
+
     def handle(self, cmd, args):
         if cmd == None: return
-        if cmd == 'ls': self.cmd_ls(args)
-        elif cmd == 'cd': self.cmd_cd(args)
-        elif cmd == 'tree': self.cmd_tree(args)
-        elif cmd == 'cal': self.cmd_cal(args)
-        elif cmd == 'mkdir': self.cmd_mkdir(args)
-        elif cmd == 'chmod': self.cmd_chmod(args)
-        elif cmd == 'help': self.cmd_help(args)
-        elif cmd == 'exit': return self.cmd_exit(args)
-        else: print(f"[stub] {cmd} {' '.join(args)}")
+        func = self.COMMAND_MAP.get(cmd)
+        if func: return func(self, args)
+        print(f"[stub] {cmd} {' '.join(args)}")
 
     def run(self):
         if self.debug: self.debug_print_params()
         if self.startup_script and os.path.isfile(self.startup_script):
-            with open(self.startup_script, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line=line.strip()
-                    if not line or line.startswith('#'): continue
-                    print(self.get_prompt()+line)
-                    cmd, args=self.parse_input(line)
-                    res=self.handle(cmd,args)
-                    if isinstance(res,tuple) and res[0]=='exit':
-                        print("[startup] exit encountered."); sys.exit(res[1])
+            # script is read in one call, then split; no per-line reads from the file object
+            with open(self.startup_script, 'r', encoding='utf-8') as f: lines = f.read().splitlines()
+            for line in lines:
+                line=line.strip()
+                if not line or line.startswith('#'): continue
+                print(self.get_prompt()+line)
+                cmd, args=self.parse_input(line)
+                res=self.handle(cmd,args)
+                if isinstance(res,tuple) and res[0]=='exit':
+                    print("[startup] exit encountered."); sys.exit(res[1])
         while self.running:
             try: line = input(self.get_prompt())
             except EOFError: print(); break
@@ -10,14 +10,43 @@ from datetime import datetime
 
 
 class VFSNode:
-    def __init__(self, name, parent=None, is_dir=False, mode=0o755, content=b''):
+    def __init__(self, name, parent=None, is_dir=False, mode=0o755, content=b'', is_b64=False, mtime=None):
         self.name = name
         self.parent = parent
         self.is_dir = is_dir
         self.children = {} if is_dir else None
-        self.content = content
+        # отсортированные имена детей: считаются при первом ls/tree и сбрасываются при добавлении
+        self._child_names = None
+        # для .b64 хранятся сырые байты, декодирование откладывается до первого чтения content
+        self._content = content
+        self.is_b64 = is_b64
         self.mode = mode
-        self.mtime = datetime.now()
+        self.mtime = mtime if mtime is not None else datetime.now()
+
+    @property
+    def content(self):
+        if self.is_b64:
+            try:
+                self._content = base64.b64decode(self._content)
+            except Exception:
+                pass
+            self.is_b64 = False
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+        self.is_b64 = False
+
+    def add_child(self, node):
+        self.children[node.name] = node
+        self._child_names = None
+        return node
+
+    def child_names(self):
+        if self._child_names is None:
+            self._child_names = sorted(self.children)
+        return self._child_names
 
     def path(self):
         parts = []
@@ -33,38 +62,34 @@ class VFS:
         self.root = VFSNode('', parent=None, is_dir=True)
         self.root.parent = None
 
-    def _ensure_dir(self, path_parts):
+    def _ensure_dir(self, path_parts, mtime=None):
         node = self.root
         for p in path_parts:
             if p not in node.children:
-                node.children[p] = VFSNode(p, parent=node, is_dir=True)
+                node.add_child(VFSNode(p, parent=node, is_dir=True, mtime=mtime))
             node = node.children[p]
         return node
 
     def load_zip(self, zip_path):
+        # одно время загрузки на все узлы вместо datetime.now() для каждого
+        now = datetime.now()
         with zipfile.ZipFile(zip_path, 'r') as zf:
             for info in zf.infolist():
                 name = info.filename
                 if name.endswith('/'):
                     # директория
                     parts = [p for p in name.split('/') if p]
-                    self._ensure_dir(parts)
+                    self._ensure_dir(parts, now)
                 else:
                     parts = name.split('/')
                     filename = parts[-1]
                     dir_parts = parts[:-1]
-                    parent = self._ensure_dir(dir_parts)
-                    raw = zf.read(info)
-                    if filename.endswith('.b64'):
-                        try:
-                            decoded = base64.b64decode(raw)
-                        except Exception:
-                            decoded = raw
-                        content = decoded
-                        filename = filename[:-4]  
-                    else:
-                        content = raw
-                    parent.children[filename] = VFSNode(filename, parent=parent, is_dir=False, content=content)
+                    parent = self._ensure_dir(dir_parts, now)
+                    is_b64 = filename.endswith('.b64')
+                    if is_b64:
+                        filename = filename[:-4]
+                    parent.add_child(VFSNode(filename, parent=parent, is_dir=False,
+                                             content=zf.read(info), is_b64=is_b64, mtime=now))
 
     def resolve(self, cwd_node, path):
         if path == '':
@@ -95,9 +120,13 @@ class VFS:
             base = cwd_node
             parts = [p for p in path.split('/') if p]
         node = base
+        # все каталоги, созданные одним вызовом, получают одно и то же время
+        now = None
         for p in parts:
             if p not in node.children:
-                node.children[p] = VFSNode(p, parent=node, is_dir=True, mode=mode)
+                if now is None:
+                    now = datetime.now()
+                node.add_child(VFSNode(p, parent=node, is_dir=True, mode=mode, mtime=now))
             else:
                 if not node.children[p].is_dir:
                     raise FileExistsError(f"File exists and is not a directory: {p}")
@@ -139,9 +168,9 @@ class ShellEmulator:
         if not target.is_dir:
             print(path)
             return
-        names = sorted(target.children.keys())
-        for name in names:
-            node = target.children[name]
+        children = target.children
+        for name in target.child_names():
+            node = children[name]
             t = 'd' if node.is_dir else '-'
             print(f"{t} {name}")
 
@@ -172,7 +201,7 @@ class ShellEmulator:
         def _walk(n, prefix=''):
             print(prefix + (n.name if n.name else '/'))
             if n.is_dir:
-                for k in sorted(n.children.keys()):
+                for k in n.child_names():
                     _walk(n.children[k], prefix + '  ')
         _walk(node)
 
@@ -264,14 +293,15 @@ class ShellEmulator:
         if not os.path.exists(self.startup_script):
             print(f"Startup script not found: {self.startup_script}")
             return
+        # скрипт читается целиком одним вызовом и затем разбивается на строки
         with open(self.startup_script, 'r', encoding='utf-8') as f:
-            for raw in f:
-                line = raw.rstrip('\n')
-                stripped = line.strip()
-                if not stripped or stripped.startswith('#'):
-                    print(f"# {line}")
-                    continue
-                self.run_line(line, echo_input=True)
+            lines = f.read().splitlines()
+        for line in lines:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                print(f"# {line}")
+                continue
+            self.run_line(line, echo_input=True)
 
     def repl(self):
         try: